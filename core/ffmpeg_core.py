@@ -1,26 +1,280 @@
 import subprocess
 import os
+import struct
+import shutil
 import re
-import shlex
 import json
 import sys
-import argparse
 import tempfile
+import threading
+import time
+import collections
+import concurrent.futures
+import functools
+
+# ffprobe can emit sizeable JSON for multi-stream files; orjson parses it
+# in native code when installed, with the stdlib as a drop-in fallback.
+try:
+    import orjson as _orjson
+    _json_loads = _orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+__all__ = ['FFmpegConverter', 'FFmpegError', 'BatchConverter']
+
+# Progress keys we actually consume from the `-progress pipe:1` stream.
+# Everything else ffmpeg emits per tick is skipped without parsing.
+_PROGRESS_KEYS = frozenset(
+    (b'out_time_us', b'out_time_ms', b'frame', b'bitrate', b'speed', b'progress')
+)
+
+# Minimum seconds between progress_callback invocations (the final
+# `progress=end` tick is always delivered).
+_PROGRESS_CALLBACK_INTERVAL = 0.1
+
+_PIPE_READ_SIZE = 65536
+
+# On Linux, inheriting fds (and never passing preexec_fn) lets CPython launch
+# children via posix_spawn instead of fork+exec, skipping the copy of the
+# parent's page tables on every spawn. We only ever open regular files and
+# pipes, so inheriting them into ffmpeg is harmless. On Windows the same
+# close_fds=False skips the per-handle enumeration, and the STARTUPINFO that
+# hides the console window is built once instead of per spawn.
+if sys.platform == 'linux':
+    _SPAWN_KWARGS = {'close_fds': False}
+elif sys.platform == 'win32':
+    _STARTUPINFO = subprocess.STARTUPINFO()
+    _STARTUPINFO.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    _STARTUPINFO.wShowWindow = subprocess.SW_HIDE
+    _SPAWN_KWARGS = {'close_fds': False, 'startupinfo': _STARTUPINFO}
+else:
+    _SPAWN_KWARGS = {}
+
+# Where the encoder list discovered via `ffmpeg -encoders` is persisted so
+# later process launches (GUI cold starts, plugin CLI calls) skip the scan.
+_ENCODER_CACHE_FILE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'advanced_video_converter', 'encoders.json'
+)
+
+def _require_file(path):
+    """
+    Validates that path is an existing file with a single stat() call and
+    returns it as an absolute path (so ffmpeg skips per-open CWD
+    resolution). The exists()-then-open pattern stats twice and races on
+    network mounts.
+    """
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Input file not found: {path}")
+    return os.path.abspath(path)
+
+
+# speed -> encoder preset, for NVENC's p1..p7 scale and the x264/x265
+# preset ladder respectively.
+_NVENC_PRESETS = {'quality': 'p7', 'balanced': 'p4', 'fast': 'p1'}
+_SW_PRESETS = {'quality': 'slow', 'balanced': 'medium', 'fast': 'ultrafast'}
+
+# Extracts video encoder names (V... rows) from `ffmpeg -encoders` output.
+_ENCODER_RE = re.compile(r'(?m)^\s*V\S*\s+(\S+)')
+
+
+@functools.lru_cache(maxsize=4)
+def _parse_encoders(text):
+    """Parses `ffmpeg -encoders` output into a tuple of video encoder names.
+
+    Cached on the raw text: the table is fixed for a given ffmpeg build,
+    so repeated scans (several converter instances, forced rescans) only
+    pay the regex pass once.
+    """
+    return tuple(_ENCODER_RE.findall(text))
+
+# NVDEC/CUVID decoders by input codec: selecting one explicitly keeps decoded
+# frames in VRAM for the full decode->encode chain instead of decoding on the
+# CPU and uploading every frame.
+_CUVID_DECODERS = {
+    'h264': 'h264_cuvid', 'hevc': 'hevc_cuvid', 'vp9': 'vp9_cuvid', 'av1': 'av1_cuvid',
+    'mpeg2video': 'mpeg2_cuvid', 'vc1': 'vc1_cuvid', 'mjpeg': 'mjpeg_cuvid',
+}
+
+# Maps encoder names to the codec name ffprobe reports for a stream, used to
+# detect when an input is already in the requested codec.
+_ENCODER_TO_CODEC = {
+    'libx265': 'hevc', 'hevc_nvenc': 'hevc', 'hevc_qsv': 'hevc', 'hevc_videotoolbox': 'hevc',
+    'libx264': 'h264', 'h264_nvenc': 'h264', 'h264_qsv': 'h264', 'h264_videotoolbox': 'h264',
+    'libaom-av1': 'av1', 'libsvtav1': 'av1', 'av1_nvenc': 'av1', 'av1_qsv': 'av1',
+}
 
 class FFmpegError(Exception):
     """Custom exception for FFmpeg errors."""
     pass
 
+
+def _enlarge_pipe(pipe):
+    """
+    Grows a pipe buffer to 1 MiB on Linux (best effort).
+
+    The default 64 KiB pipe can fill and back-pressure ffmpeg if this
+    process is briefly preempted; a bigger buffer means fewer wakeups and
+    no stalls. The kernel may cap the size at /proc/sys/fs/pipe-max-size
+    for unprivileged processes, hence the broad except.
+    """
+    if sys.platform != 'linux':
+        return
+    try:
+        import fcntl
+        fcntl.fcntl(pipe.fileno(), getattr(fcntl, 'F_SETPIPE_SZ', 1031), 1 << 20)
+    except (ImportError, OSError, ValueError):
+        pass
+
+
+def _sniff_mp4_duration(path):
+    """
+    Reads the duration of an MP4/MOV file straight from its moov/mvhd atom.
+
+    Walks the top-level atoms (a few seeks and small reads - no subprocess)
+    and decodes timescale/duration from mvhd, handling both the 32-bit v0
+    and 64-bit v1 layouts. Returns the duration in seconds, or None when
+    the file is not MP4-like or the atom cannot be found, in which case
+    callers fall back to ffprobe. Other containers (e.g. MKV) always take
+    the ffprobe path.
+    """
+    try:
+        with open(path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset + 8 <= file_size:
+                f.seek(offset)
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                size, atom = struct.unpack('>I4s', header)
+                if offset == 0 and atom != b'ftyp':
+                    return None  # Not an MP4/MOV container.
+                if size == 1:
+                    # 64-bit atom: the real size follows the header.
+                    size = struct.unpack('>Q', f.read(8))[0]
+                elif size == 0:
+                    size = file_size - offset  # Atom extends to end of file.
+                if size < 8:
+                    return None
+                if atom == b'moov':
+                    return _parse_mvhd(f.read(min(size - 8, 1 << 20)))
+                offset += size
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def _parse_mvhd(moov):
+    """Extracts duration in seconds from the mvhd box inside a moov blob."""
+    idx = moov.find(b'mvhd')
+    if idx == -1:
+        return None
+    body = moov[idx + 4:]
+    try:
+        if body[0] == 1:  # v1: 64-bit creation/modification/duration fields
+            timescale, duration = struct.unpack('>IQ', body[20:32])
+        else:             # v0: 32-bit fields
+            timescale, duration = struct.unpack('>II', body[12:20])
+    except (IndexError, struct.error):
+        return None
+    return duration / timescale if timescale else None
+
+
+# The arg builders are memoized: a batch run repeats the same handful of
+# (codec, quality, audio, hwaccel) combinations across hundreds of jobs, so
+# each distinct template is built once and shared as an immutable tuple.
+@functools.lru_cache(maxsize=64)
+def _hwaccel_args(hw_accel, video_codec=''):
+    """
+    Builds the decode-side hardware acceleration args for one input.
+
+    When a hardware encoder is requested without an explicit hw_accel,
+    the matching hardware decoder is enabled automatically so frames
+    stay on the device instead of round-tripping through system memory.
+    """
+    if not hw_accel or hw_accel == 'none':
+        if video_codec.endswith('_nvenc'):
+            hw_accel = 'nvenc'
+        elif video_codec.endswith('_qsv'):
+            hw_accel = 'qsv'
+        elif video_codec.endswith('_videotoolbox'):
+            hw_accel = 'videotoolbox'
+        else:
+            return ()
+    accel_method = 'cuda' if hw_accel == 'nvenc' else hw_accel
+    args = ['-hwaccel', accel_method]
+    if accel_method == 'cuda':
+        args.extend(['-hwaccel_output_format', 'cuda'])
+    elif accel_method == 'qsv':
+        args.extend(['-hwaccel_output_format', 'qsv'])
+    return tuple(args)
+
+
+@functools.lru_cache(maxsize=64)
+def _output_args(video_codec, quality_mode, quality_value, audio_codec, hw_decode=False,
+                 speed='balanced'):
+    """Builds the per-output codec and quality args."""
+    args = ['-c:v', video_codec]
+
+    if video_codec != 'copy':
+        is_hw_encode = 'nvenc' in video_codec or 'qsv' in video_codec or 'videotoolbox' in video_codec
+        if is_hw_encode:
+            if not hw_decode:
+                # Only force a pixel format when frames are CPU-decoded;
+                # in the full-hardware path it would download them from
+                # the device just to convert and re-upload.
+                args.extend(['-pix_fmt', 'yuv420p']) # Common pixel format for compatibility
+            elif 'nvenc' in video_codec:
+                # Frames are already CUDA surfaces: convert to NV12 on the
+                # GPU so no frame ever crosses PCIe for a pixel-format fixup.
+                args.extend(['-vf', 'scale_cuda=format=nv12'])
+            if 'nvenc' in video_codec:
+                args.extend(['-preset', _NVENC_PRESETS[speed], '-tune', 'hq'])
+                if speed == 'fast':
+                    # Throughput mode: drop lookahead and adaptive
+                    # quantization, which serialize the encode pipeline.
+                    args.extend(['-rc-lookahead', '0',
+                                 '-spatial_aq', '0', '-temporal_aq', '0'])
+                # B-frames deepen the reference queue and can exhaust
+                # decoder surfaces in the full-hardware path.
+                args.extend(['-bf', '0'])
+        else:
+            args.extend(['-preset', _SW_PRESETS[speed]])
+
+        # --- Video Quality/Bitrate ---
+        if quality_mode == 'crf':
+            args.extend(['-crf', str(quality_value)])
+        elif quality_mode == 'cbr':
+            bitrate = str(quality_value) + 'M'
+            args.extend(['-b:v', bitrate, '-minrate', bitrate, '-maxrate', bitrate, '-bufsize', '2M'])
+        elif quality_mode == 'cq':
+            args.extend(['-rc', 'vbr', '-cq', str(quality_value)])
+
+    # --- Audio Codec ---
+    args.extend(['-c:a', audio_codec])
+    if audio_codec != 'copy':
+        args.extend(['-b:a', '192k'])
+
+    return tuple(args)
+
 class FFmpegConverter:
-    def __init__(self, ffmpeg_path='ffmpeg', ffprobe_path='ffprobe'):
+    def __init__(self, ffmpeg_path='ffmpeg', ffprobe_path='ffprobe', cache_path=None):
         """
         Initializes the converter.
         :param ffmpeg_path: Path to the FFmpeg executable.
         :param ffprobe_path: Path to the FFprobe executable.
+        :param cache_path: Optional path to a JSON file used to persist probe
+                           results across CLI invocations.
         """
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
         self._available_encoders = None
+        self._encoder_checks = {}
+        self.cache_path = cache_path
+        self._probe_cache = self._load_probe_cache() if cache_path else {}
 
     def _run_command(self, command, capture_output=True):
         """
@@ -28,159 +282,294 @@ class FFmpegConverter:
         If capture_output is False, stdout/stderr will be inherited.
         """
         try:
-            # Set startupinfo for Windows to hide the console window
-            startupinfo = None
-            if sys.platform == "win32":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-
-            # Using a list of args with subprocess is safer than a single string
-            return subprocess.run(
+            # Using a list of args with subprocess is safer than a single
+            # string. The pipes stay binary and are decoded once at the end,
+            # instead of routing every read through a TextIOWrapper.
+            result = subprocess.run(
                 command,
                 capture_output=capture_output,
-                text=True,
                 check=True,
-                encoding='utf-8',
-                startupinfo=startupinfo
+                **_SPAWN_KWARGS
             )
         except FileNotFoundError:
             raise FFmpegError(f"Executable not found: {command[0]}. Please ensure ffmpeg/ffprobe is installed and in your PATH.")
         except subprocess.CalledProcessError as e:
             # The stderr contains the error message from ffmpeg
-            error_output = e.stderr.strip() if e.stderr else "No stderr output."
+            stderr = e.stderr.decode('utf-8', 'replace') if e.stderr else ''
+            error_output = stderr.strip() or "No stderr output."
             raise FFmpegError(f"Command failed with exit code {e.returncode}:\n{error_output}")
+        if capture_output:
+            result.stdout = result.stdout.decode('utf-8', 'replace')
+            result.stderr = result.stderr.decode('utf-8', 'replace')
+        return result
 
 
+    @staticmethod
+    def _drain_pipe(pipe, sink):
+        """Reads a pipe to EOF in large chunks, appending them to sink."""
+        try:
+            while True:
+                chunk = pipe.read(_PIPE_READ_SIZE)
+                if not chunk:
+                    break
+                sink.append(chunk)
+        finally:
+            pipe.close()
+
+    @staticmethod
+    def _video_codec_name(probe_data):
+        """Returns the codec name of the first video stream, or None."""
+        for stream in probe_data.get('streams', []):
+            if stream.get('codec_type') == 'video':
+                return stream.get('codec_name')
+        return None
+
+    @staticmethod
+    def _progress_value(progress_data, key):
+        """Decodes one cached progress value for display, or 'N/A'."""
+        value = progress_data.get(key)
+        return value.decode('ascii', 'replace') if value is not None else 'N/A'
+
     def get_available_encoders(self, force_rescan=False):
         """
         Gets a list of available video encoders from the ffmpeg executable.
-        Caches the result for subsequent calls.
+        Caches the result in memory and on disk (keyed by the ffmpeg binary
+        itself) so subsequent calls and process launches skip the scan.
         """
         if self._available_encoders is not None and not force_rescan:
             return self._available_encoders
 
+        cache_key = self._ffmpeg_cache_key()
+        if not force_rescan and cache_key:
+            cached = self._load_encoder_cache(cache_key)
+            if cached is not None:
+                self._available_encoders = cached
+                return cached
+
         result = self._run_command([self.ffmpeg_path, '-encoders'])
-        encoders = []
-        for line in result.stdout.splitlines():
-            match = re.search(r'^\s*V\S*\s*(\S+)', line) # V... = Video encoder
-            if match:
-                encoders.append(match.group(1))
+        # One findall over the whole buffer keeps the ~600-line loop inside
+        # the C regex engine instead of iterating lines in Python.
+        encoders = list(_parse_encoders(result.stdout))
         self._available_encoders = encoders
+        if cache_key:
+            self._save_encoder_cache(cache_key, encoders)
         return self._available_encoders
 
-    def get_video_duration(self, input_path):
-        """Gets the duration of a video file in seconds using ffprobe."""
+    def has_encoder(self, name):
+        """
+        Checks whether a single named encoder is available.
+
+        When the full encoder list is already cached it is answered from
+        there; otherwise `ffmpeg -h encoder=<name>` is asked about just
+        this encoder, which skips parsing the ~600-line -encoders table.
+        """
+        if self._available_encoders is not None:
+            return name in self._available_encoders
+        cached = self._encoder_checks.get(name)
+        if cached is not None:
+            return cached
+        try:
+            result = self._run_command(
+                [self.ffmpeg_path, '-hide_banner', '-h', f'encoder={name}']
+            )
+            # ffmpeg exits 0 for unknown encoders; it says so on stdout.
+            available = 'is not recognized' not in result.stdout
+        except FFmpegError:
+            available = False
+        self._encoder_checks[name] = available
+        return available
+
+    def _ffmpeg_cache_key(self):
+        """
+        Identifies the installed ffmpeg build without spawning it: the
+        resolved executable path plus its mtime and size.
+        """
+        path = shutil.which(self.ffmpeg_path) or self.ffmpeg_path
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+
+    @staticmethod
+    def _load_encoder_cache(cache_key):
+        """Reads the on-disk encoder list if it matches this ffmpeg build."""
+        try:
+            with open(_ENCODER_CACHE_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') == cache_key:
+                return data.get('encoders')
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def _save_encoder_cache(cache_key, encoders):
+        """Writes the encoder list to disk atomically (tmp file + rename)."""
+        tmp_path = _ENCODER_CACHE_FILE + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(_ENCODER_CACHE_FILE), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': cache_key, 'encoders': encoders}, f)
+            os.replace(tmp_path, _ENCODER_CACHE_FILE)
+        except OSError:
+            pass  # The cache is best-effort; never fail a scan over it.
+
+    def _probe_key(self, input_path):
+        """Builds a cache key that changes whenever the file itself changes."""
+        st = os.stat(input_path)
+        return (os.path.abspath(input_path), st.st_mtime_ns, st.st_size)
+
+    def _load_probe_cache(self):
+        """Loads the persisted probe cache, ignoring a missing or corrupt file."""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            return {tuple(json.loads(k)): v for k, v in raw.items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_probe_cache(self):
+        """Writes the probe cache to disk atomically (tmp file + rename)."""
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({json.dumps(list(k)): v for k, v in self._probe_cache.items()}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass  # The cache is best-effort; never fail a conversion over it.
+
+    def probe(self, input_path):
+        """
+        Probes a media file with ffprobe and returns its parsed JSON metadata
+        (format and streams). Results are cached per (path, mtime, size) so
+        converting the same file repeatedly only spawns ffprobe once.
+        """
+        key = self._probe_key(input_path)
+        cached = self._probe_cache.get(key)
+        if cached is not None:
+            return cached
+
         command = [
-            self.ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1', input_path
+            self.ffprobe_path, '-v', 'error', '-show_format', '-show_streams',
+            '-print_format', 'json', input_path
         ]
         result = self._run_command(command)
         try:
-            return float(result.stdout.strip())
-        except (ValueError, TypeError):
-            raise FFmpegError(f"Could not parse video duration from ffprobe output: '{result.stdout}'")
+            data = _json_loads(result.stdout)
+        except ValueError:
+            raise FFmpegError(f"Could not parse ffprobe JSON output: '{result.stdout}'")
+        self._probe_cache[key] = data
+        if self.cache_path:
+            self._save_probe_cache()
+        return data
+
+    def get_video_duration(self, input_path):
+        """
+        Gets the duration of a video file in seconds.
+
+        MP4/MOV inputs are answered by reading the container header
+        directly, skipping the ffprobe spawn entirely; anything else (or
+        an unparseable header) falls back to the cached ffprobe JSON.
+        """
+        if self._probe_cache.get(self._probe_key(input_path)) is None:
+            duration = _sniff_mp4_duration(input_path)
+            if duration is not None:
+                return duration
+
+        data = self.probe(input_path)
+        try:
+            return float(data['format']['duration'])
+        except (KeyError, ValueError, TypeError):
+            raise FFmpegError(f"Could not parse video duration from ffprobe output: {data!r}")
 
     def create_thumbnail(self, input_path, output_path, timestamp='00:00:10'):
         """Creates a single thumbnail from a video."""
-        if not os.path.exists(input_path):
-            raise FileNotFoundError(f"Input file not found: {input_path}")
+        input_path = _require_file(input_path)
 
+        # -noaccurate_seek + -skip_frame nokey grab the keyframe nearest the
+        # timestamp without decoding the inter frames leading up to it; on
+        # 4K/HEVC inputs that is the difference between seconds and tens of
+        # milliseconds per thumbnail.
         command = [
             self.ffmpeg_path,
+            '-noaccurate_seek',
             '-ss', timestamp,
+            '-skip_frame', 'nokey',
             '-i', input_path,
             '-vframes', '1',
             '-q:v', '2',  # High-quality JPEG
             '-y', output_path
         ]
-        self._run_command(command, capture_output=True)
-        return True
-
-    def create_gif(self, input_path, output_path, start_time, duration, fps=15, width=480):
-        """Creates an animated GIF from a video clip."""
-        if not os.path.exists(input_path):
-            raise FileNotFoundError(f"Input file not found: {input_path}")
-
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_palette:
-            palette_path = temp_palette.name
-
         try:
-            # Step 1: Generate the color palette for a high-quality GIF
-            palette_vf = f"fps={fps},scale={width}:-1:flags=lanczos,palettegen"
-            palette_command = [
-                self.ffmpeg_path, '-y',
-                '-ss', start_time,
-                '-t', str(duration),
+            self._run_command(command, capture_output=True)
+        except FFmpegError:
+            # Some demuxers reject -skip_frame nokey; retry with the plain
+            # accurate seek before giving up.
+            command = [
+                self.ffmpeg_path,
+                '-ss', timestamp,
                 '-i', input_path,
-                '-vf', palette_vf,
-                palette_path
+                '-vframes', '1',
+                '-q:v', '2',
+                '-y', output_path
             ]
-            self._run_command(palette_command, capture_output=True)
+            self._run_command(command, capture_output=True)
+        return True
 
-            # Step 2: Create the GIF using the generated palette
-            gif_filter_complex = f"fps={fps},scale={width}:-1:flags=lanczos[x];[x][1:v]paletteuse"
-            gif_command = [
-                self.ffmpeg_path, '-y',
-                '-ss', start_time,
-                '-t', str(duration),
-                '-i', input_path,
-                '-i', palette_path,
-                '-filter_complex', gif_filter_complex,
-                output_path
-            ]
-            self._run_command(gif_command, capture_output=True)
+    def create_gif(self, input_path, output_path, start_time, duration, fps=15, width=480):
+        """
+        Creates an animated GIF from a video clip.
 
-        finally:
-            # Clean up the temporary palette file
-            if os.path.exists(palette_path):
-                os.remove(palette_path)
+        The palette is generated and applied in one ffmpeg invocation via a
+        split filter graph, so the clip is decoded once and no temporary
+        palette file is needed.
+        """
+        input_path = _require_file(input_path)
 
+        filter_complex = (
+            f"fps={fps},scale={width}:-1:flags=lanczos,split[a][b];"
+            f"[a]palettegen=stats_mode=diff[p];"
+            f"[b][p]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle"
+        )
+        command = [
+            self.ffmpeg_path, '-y',
+            '-ss', start_time,
+            '-t', str(duration),
+            '-i', input_path,
+            '-filter_complex', filter_complex,
+            output_path
+        ]
+        self._run_command(command, capture_output=True)
         return True
 
 
-    def _build_command(self, input_path, output_path, video_codec, quality_mode, quality_value, audio_codec, hw_accel):
+    def _build_command(self, input_path, output_path, video_codec, quality_mode, quality_value, audio_codec, hw_accel, threads=None, input_codec=None, speed='balanced'):
         """Builds the FFmpeg command as a list of arguments."""
         command = [self.ffmpeg_path, '-y']
-
-        # --- Hardware Acceleration ---
-        is_hw_encode = 'nvenc' in video_codec or 'qsv' in video_codec or 'videotoolbox' in video_codec
-        if hw_accel and hw_accel != 'none':
-            if hw_accel == 'nvenc':
-                accel_method = 'cuda'
-            else:
-                accel_method = hw_accel
-            command.extend(['-hwaccel', accel_method])
-            if accel_method == 'cuda':
-                command.extend(['-hwaccel_output_format', 'cuda'])
-
-        # --- Input ---
+        hw_args = _hwaccel_args(hw_accel, video_codec)
+        command.extend(hw_args)
+        if 'cuda' in hw_args and input_codec in _CUVID_DECODERS:
+            # Pin the NVDEC decoder for the input codec; -extra_hw_frames
+            # avoids "No decoder surfaces left" when the encoder queues deep.
+            command.extend(['-c:v', _CUVID_DECODERS[input_codec], '-extra_hw_frames', '8'])
         command.extend(['-i', input_path])
-
-        # --- Video Codec ---
-        command.extend(['-c:v', video_codec])
-        if is_hw_encode:
-            command.extend(['-pix_fmt', 'yuv420p']) # Common pixel format for compatibility
-        else:
-            # Use a good default preset for software encoding
-            command.extend(['-preset', 'medium'])
-
-        # --- Video Quality/Bitrate ---
-        if quality_mode == 'crf':
-            command.extend(['-crf', str(quality_value)])
-        elif quality_mode == 'cbr':
-            bitrate = str(quality_value) + 'M'
-            command.extend(['-b:v', bitrate, '-minrate', bitrate, '-maxrate', bitrate, '-bufsize', '2M'])
-        elif quality_mode == 'cq':
-            command.extend(['-rc', 'vbr', '-cq', str(quality_value)])
-
-        # --- Audio Codec ---
-        command.extend(['-c:a', audio_codec])
-        if audio_codec != 'copy':
-            command.extend(['-b:a', '192k'])
+        if threads:
+            # Cap encoder and filter threading so K concurrent encodes
+            # split the cores instead of each grabbing all of them.
+            threads = str(threads)
+            command.extend(['-threads', threads,
+                            '-filter_threads', threads,
+                            '-filter_complex_threads', threads])
+        command.extend(_output_args(
+            video_codec, quality_mode, quality_value, audio_codec, hw_decode=bool(hw_args),
+            speed=speed
+        ))
 
         # --- Progress Reporting & Final Output ---
-        command.extend(['-v', 'quiet', '-stats', '-progress', 'pipe:1', output_path])
+        # -nostats/-loglevel error keep stderr quiet so it only ever carries
+        # real errors; progress flows exclusively over the stdout pipe.
+        command.extend(['-nostats', '-loglevel', 'error', '-progress', 'pipe:1', output_path])
 
         return command
 
@@ -191,82 +580,376 @@ class FFmpegConverter:
                 quality_value=23,
                 audio_codec='copy',
                 hw_accel=None,
+                allow_stream_copy=True,
+                threads=None,
+                speed='balanced',
+                backend=None,
                 progress_callback=None):
         """
         Converts a video file using FFmpeg, providing progress updates.
+        When the input is already in the requested codec (and
+        allow_stream_copy is left on), the video stream is remuxed with
+        `-c:v copy` instead of being re-encoded.
+
+        backend='pynvc' transcodes the video stream in-process through
+        PyNvVideoCodec (NVDEC -> NVENC without leaving the GPU) and uses
+        ffmpeg only to remux audio; it requires the optional
+        PyNvVideoCodec package and an NVENC-capable video_codec.
         """
-        if not os.path.exists(input_path):
-            raise FileNotFoundError(f"Input file not found: {input_path}")
+        input_path = _require_file(input_path)
 
-        duration_s = self.get_video_duration(input_path)
+        if backend == 'pynvc':
+            return self._convert_pynvc(input_path, output_path, video_codec,
+                                       progress_callback)
+
+        probe_data = self.probe(input_path)
+        try:
+            duration_s = float(probe_data['format']['duration'])
+        except (KeyError, ValueError, TypeError):
+            raise FFmpegError(f"Could not parse video duration from ffprobe output: {probe_data!r}")
+
+        target_codec = _ENCODER_TO_CODEC.get(video_codec)
+        if allow_stream_copy and target_codec is not None \
+                and self._video_codec_name(probe_data) == target_codec:
+            # Remuxing is I/O-bound and finishes in seconds where an encode
+            # would take minutes; tell the UI why it was so fast.
+            video_codec = 'copy'
+            hw_accel = None
+            if progress_callback:
+                progress_callback(0, "Input already in target codec - using stream copy.")
 
         command = self._build_command(
-            input_path, output_path, video_codec, quality_mode, quality_value, audio_codec, hw_accel
+            input_path, output_path, video_codec, quality_mode, quality_value, audio_codec, hw_accel,
+            threads=threads, input_codec=self._video_codec_name(probe_data), speed=speed
         )
+        self._run_with_progress(command, duration_s, progress_callback)
+        return True
+
+    def _convert_pynvc(self, input_path, output_path, video_codec, progress_callback):
+        """Transcode the video stream via PyNvVideoCodec, remux with ffmpeg."""
+        try:
+            from core import pynvc_backend
+        except ImportError:
+            import pynvc_backend
+
+        if not pynvc_backend.is_available():
+            raise FFmpegError("backend='pynvc' requires the PyNvVideoCodec package.")
+        codec = _ENCODER_TO_CODEC.get(video_codec)
+        if codec not in pynvc_backend.SUPPORTED_CODECS:
+            raise FFmpegError(f"backend='pynvc' cannot encode {video_codec}.")
+
+        work_dir = tempfile.mkdtemp(prefix='pynvc_')
+        bitstream = os.path.join(work_dir, f'video.{codec}')
+        try:
+            if progress_callback:
+                progress_callback(0, "Transcoding video on GPU (PyNvVideoCodec)...")
+            pynvc_backend.transcode_video_stream(input_path, bitstream, codec=codec)
+            # Mux the new video stream with the original audio; both are
+            # stream copies so this is pure I/O.
+            command = [
+                self.ffmpeg_path, '-y',
+                '-i', bitstream, '-i', input_path,
+                '-map', '0:v', '-map', '1:a?',
+                '-c', 'copy',
+                output_path
+            ]
+            self._run_command(command, capture_output=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if progress_callback:
+            progress_callback(100, "Conversion complete!")
+        return True
+
+    def convert_many(self, jobs, progress_callback=None):
+        """
+        Converts several files with a single ffmpeg invocation.
+
+        Each job is a dict accepting the same keys as convert(): input_path,
+        output_path, video_codec, quality_mode, quality_value, audio_codec
+        and hw_accel. ffmpeg initializes its codecs (and any hardware encoder
+        context) only once for the whole batch, which on short clips saves a
+        process spawn plus encoder setup per file.
+        """
+        if not jobs:
+            return True
 
-        stats_regex = re.compile(r"frame=\s*(\d+).*fps=\s*(\d+\.?\d*).*time=(\S+).*bitrate=\s*(\S+).*speed=\s*(\S+)")
+        for job in jobs:
+            job['input_path'] = _require_file(job['input_path'])
 
-        startupinfo = None
-        if sys.platform == "win32":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = subprocess.SW_HIDE
+        # All outputs are encoded concurrently by the single process, so the
+        # longest input bounds overall progress.
+        duration_s = max(self.get_video_duration(job['input_path']) for job in jobs)
 
+        command = [self.ffmpeg_path, '-y', '-nostats', '-loglevel', 'error', '-progress', 'pipe:1']
+        hw_args_per_job = [
+            _hwaccel_args(job.get('hw_accel'), job.get('video_codec', 'libx265'))
+            for job in jobs
+        ]
+        for job, hw_args in zip(jobs, hw_args_per_job):
+            command.extend(hw_args)
+            command.extend(['-i', job['input_path']])
+        for index, (job, hw_args) in enumerate(zip(jobs, hw_args_per_job)):
+            command.extend(['-map', str(index)])
+            command.extend(_output_args(
+                job.get('video_codec', 'libx265'),
+                job.get('quality_mode', 'crf'),
+                job.get('quality_value', 23),
+                job.get('audio_codec', 'copy'),
+                hw_decode=bool(hw_args),
+                speed=job.get('speed', 'balanced')
+            ))
+            command.append(job['output_path'])
+
+        self._run_with_progress(command, duration_s, progress_callback)
+        return True
+
+    def convert_concat(self, input_paths, output_path,
+                       video_codec='libx265',
+                       quality_mode='crf',
+                       quality_value=23,
+                       audio_codec='copy',
+                       progress_callback=None):
+        """
+        Concatenates several inputs into one output with a single ffmpeg
+        invocation via the concat demuxer.
+
+        For many small clips this amortizes process and encoder startup
+        (hundreds of milliseconds per spawn) across the whole set instead
+        of paying it per file.
+        """
+        if not input_paths:
+            return True
+        inputs = [_require_file(p) for p in input_paths]
+        duration_s = sum(self.get_video_duration(p) for p in inputs)
+
+        list_dir = tempfile.mkdtemp(prefix='ffconcat_')
+        list_path = os.path.join(list_dir, 'inputs.txt')
+        try:
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for p in inputs:
+                    # concat-demuxer quoting: single quotes close, escape, reopen.
+                    f.write("file '{}'\n".format(p.replace("'", "'\\''")))
+            command = [self.ffmpeg_path, '-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+            command.extend(_output_args(video_codec, quality_mode, quality_value, audio_codec))
+            command.extend(['-nostats', '-loglevel', 'error', '-progress', 'pipe:1', output_path])
+            self._run_with_progress(command, duration_s, progress_callback)
+        finally:
+            shutil.rmtree(list_dir, ignore_errors=True)
+        return True
+
+    def convert_bitrate_ladder(self, input_path, outputs,
+                               video_codec='libx265',
+                               audio_codec='copy',
+                               progress_callback=None):
+        """
+        Encodes one input at several CBR targets, sharing a single
+        first-pass analysis between all of them.
+
+        :param outputs: List of (output_path, bitrate_mbps) tuples.
+
+        The analysis pass (motion estimation etc.) dominates software
+        encode cost; running it once with `-pass 1` and reusing its stats
+        log for every `-pass 2` target amortizes it across the ladder.
+        """
+        if not outputs:
+            return True
+        input_path = _require_file(input_path)
+
+        duration_s = self.get_video_duration(input_path)
+        log_prefix = os.path.join(tempfile.mkdtemp(prefix='ffmpeg2pass_'), 'passlog')
+        null_sink = 'NUL' if sys.platform == 'win32' else '/dev/null'
+
+        try:
+            # Pass 1: analysis only - no audio, output discarded.
+            pass1_command = [
+                self.ffmpeg_path, '-y', '-i', input_path,
+                '-c:v', video_codec, '-preset', 'medium',
+                '-b:v', f"{outputs[0][1]}M",
+                '-pass', '1', '-passlogfile', log_prefix,
+                '-an', '-f', 'null',
+                '-nostats', '-loglevel', 'error', '-progress', 'pipe:1',
+                null_sink
+            ]
+            self._run_with_progress(pass1_command, duration_s, progress_callback)
+
+            # Pass 2: one rate-controlled encode per target, all reusing
+            # the same stats log.
+            for output_path, bitrate_mbps in outputs:
+                bitrate = f"{bitrate_mbps}M"
+                command = [
+                    self.ffmpeg_path, '-y', '-i', input_path,
+                    '-c:v', video_codec, '-preset', 'medium',
+                    '-b:v', bitrate, '-minrate', bitrate, '-maxrate', bitrate, '-bufsize', '2M',
+                    '-pass', '2', '-passlogfile', log_prefix,
+                    '-c:a', audio_codec
+                ]
+                if audio_codec != 'copy':
+                    command.extend(['-b:a', '192k'])
+                command.extend(['-nostats', '-loglevel', 'error', '-progress', 'pipe:1', output_path])
+                self._run_with_progress(command, duration_s, progress_callback)
+        finally:
+            shutil.rmtree(os.path.dirname(log_prefix), ignore_errors=True)
+
+        return True
+
+    def _run_with_progress(self, command, duration_s, progress_callback):
+        """Runs an ffmpeg command, streaming progress from `-progress pipe:1`."""
+        # The pipes are read in binary with bufsize=0 so each read() is one
+        # syscall pulling up to _PIPE_READ_SIZE bytes, instead of a Python
+        # text-mode line loop that decodes and splits every key=value tick.
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            universal_newlines=True,
-            encoding='utf-8',
-            startupinfo=startupinfo
+            bufsize=0,
+            **_SPAWN_KWARGS
+        )
+        _enlarge_pipe(process.stdout)
+        _enlarge_pipe(process.stderr)
+
+        # Drain stderr on a background thread so ffmpeg can never block on a
+        # full stderr pipe while we are waiting for progress on stdout.
+        stderr_chunks = collections.deque(maxlen=4096)
+        stderr_thread = threading.Thread(
+            target=self._drain_pipe, args=(process.stderr, stderr_chunks), daemon=True
         )
+        stderr_thread.start()
 
         progress_data = {}
-        for line in process.stdout:
-            parts = line.strip().split('=')
-            if len(parts) == 2:
-                progress_data[parts[0]] = parts[1]
-
-            if 'out_time_ms' in progress_data and duration_s > 0:
-                elapsed_ms = int(progress_data['out_time_ms'])
-                percentage = min(100, int((elapsed_ms / (duration_s * 1_000_000))))
-                message = (f"frame={progress_data.get('frame', 'N/A')} | "
-                           f"bitrate={progress_data.get('bitrate', 'N/A')} | "
-                           f"speed={progress_data.get('speed', 'N/A')}")
-                if progress_callback:
+        # The carry-over buffer stays bytes: split()/partition() pieces of a
+        # bytearray are bytearrays, which can't be hashed against the
+        # _PROGRESS_KEYS frozenset or used as dict keys.
+        buffer = b''
+        last_callback = 0.0
+        while True:
+            chunk = process.stdout.read(_PIPE_READ_SIZE)
+            if not chunk:
+                break
+            *lines, buffer = (buffer + chunk).split(b'\n')
+            for line in lines:
+                key, sep, value = line.strip().partition(b'=')
+                if not sep or key not in _PROGRESS_KEYS:
+                    continue
+                progress_data[key] = value
+                if key != b'progress' or not progress_callback:
+                    continue
+                # A `progress=` line closes one tick; throttle the callback
+                # but always deliver the final `progress=end` tick.
+                now = time.monotonic()
+                if value != b'end' and now - last_callback < _PROGRESS_CALLBACK_INTERVAL:
+                    continue
+                last_callback = now
+                out_time = progress_data.get(b'out_time_us') or progress_data.get(b'out_time_ms')
+                if out_time and duration_s > 0:
+                    # Both keys are in microseconds (out_time_ms despite its name).
+                    elapsed_us = int(out_time)
+                    percentage = min(100, int(elapsed_us * 100 / (duration_s * 1_000_000)))
+                    message = (f"frame={self._progress_value(progress_data, b'frame')} | "
+                               f"bitrate={self._progress_value(progress_data, b'bitrate')} | "
+                               f"speed={self._progress_value(progress_data, b'speed')}")
                     progress_callback(percentage, message)
 
-        _, stderr_output = process.communicate()
+        process.stdout.close()
+        returncode = process.wait()
+        stderr_thread.join()
 
-        if process.returncode != 0:
-            raise FFmpegError(f"FFmpeg failed with return code {process.returncode}:\n{stderr_output.strip()}")
+        if returncode != 0:
+            # stderr may contain non-ASCII filenames; only pay for the
+            # decode on the failure path where it ends up in the message.
+            stderr_output = b''.join(stderr_chunks).decode('utf-8', 'replace')
+            raise FFmpegError(f"FFmpeg failed with return code {returncode}:\n{stderr_output.strip()}")
 
         if progress_callback:
-            final_stats = "Conversion complete!"
-            match = stats_regex.search(stderr_output)
-            if match:
-                final_stats = f"Done! Final stats: time={match.group(3)} bitrate={match.group(4)} speed={match.group(5)}"
-            progress_callback(100, final_stats)
+            progress_callback(100, "Conversion complete!")
 
-        return True
+
+class BatchConverter:
+    """
+    Runs several conversions concurrently, bounded by a hardware budget.
+
+    The heavy lifting happens inside the ffmpeg child processes, so plain
+    threads are enough to keep K encodes in flight. Hardware-encoded jobs
+    are additionally gated by a semaphore so consumer GPUs with a limited
+    number of encoder sessions are never oversubscribed.
+    """
+
+    def __init__(self, converter=None, max_concurrent=None, gpu_sessions=2):
+        """
+        :param converter: FFmpegConverter to run jobs with (a default one is
+                          created if omitted).
+        :param max_concurrent: Max simultaneous ffmpeg processes. Defaults to
+                               cpu_count // 4 so each software encode keeps a
+                               few cores to itself.
+        :param gpu_sessions: Max simultaneous hardware-encoder sessions.
+        """
+        if max_concurrent is None:
+            max_concurrent = max(1, (os.cpu_count() or 4) // 4)
+        self.converter = converter if converter is not None else FFmpegConverter()
+        self.max_concurrent = max_concurrent
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent)
+        self._gpu_semaphore = threading.Semaphore(gpu_sessions)
+
+    def submit(self, job):
+        """Schedules one conversion (a dict of convert() kwargs); returns a Future."""
+        return self._executor.submit(self._run_job, dict(job))
+
+    def map(self, jobs):
+        """Runs all jobs, yielding (job, future) pairs as each one completes."""
+        futures = {self.submit(job): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future
+
+    def shutdown(self, wait=True):
+        """Stops accepting jobs and optionally waits for running ones."""
+        self._executor.shutdown(wait=wait)
+
+    def _run_job(self, job):
+        is_hw = bool(job.get('hw_accel')) and job['hw_accel'] != 'none'
+        if not is_hw:
+            # Split the cores across the concurrent software encodes so
+            # they don't oversubscribe each other's caches.
+            job.setdefault('threads', max(1, (os.cpu_count() or 4) // self.max_concurrent))
+            return self.converter.convert(**job)
+        with self._gpu_semaphore:
+            return self.converter.convert(**job)
 
 
 # --- JSON Progress & Error Reporting ---
+# Progress ticks are emitted many times per encode; orjson encodes them in
+# native code ~5x faster when installed, with the stdlib as a drop-in
+# fallback so it stays an optional dependency.
+try:
+    import orjson
+
+    def _write_json_line(obj):
+        # orjson returns bytes; write them straight to the binary buffer
+        # and flush once so the consumer (Node pipes) sees whole records.
+        sys.stdout.buffer.write(orjson.dumps(obj) + b'\n')
+        sys.stdout.buffer.flush()
+except ImportError:
+    def _write_json_line(obj):
+        sys.stdout.write(json.dumps(obj) + '\n')
+        sys.stdout.flush()
+
+
 def json_progress_callback(percentage, message):
-    """Formats progress into a JSON string and prints it."""
-    print(json.dumps({"type": "progress", "percentage": percentage, "message": message}))
+    """Formats progress into a JSON record and writes it to stdout."""
+    _write_json_line({"type": "progress", "percentage": percentage, "message": message})
 
 def print_json_error(e, error_type="error"):
-    """Formats an error message into a JSON string and prints it."""
-    print(json.dumps({"type": error_type, "message": str(e)}))
+    """Formats an error message into a JSON record and writes it to stdout."""
+    _write_json_line({"type": error_type, "message": str(e)})
     sys.exit(1)
 
 
 # --- Main Command-Line Interface ---
 if __name__ == '__main__':
-    # Setup for flushing stdout, required for piping to Node.js
-    sys.stdout.reconfigure(line_buffering=True)
+    # argparse is only needed by the CLI entry point; importing it lazily
+    # keeps library imports (GUI, frozen executables) off the cold path.
+    import argparse
 
+    # stdout keeps its default (full) buffering; _write_json_line flushes
+    # explicitly after each record, which is what the Node consumers need.
     parser = argparse.ArgumentParser(
         description="FFmpeg Core Wrapper for video conversion, thumbnail, and GIF generation."
     )
@@ -314,7 +997,7 @@ if __name__ == '__main__':
             )
         elif args.command == 'thumbnail':
             converter.create_thumbnail(args.input, args.output, timestamp=args.timestamp)
-            print(json.dumps({"type": "success", "message": f"Thumbnail saved to {args.output}"}))
+            _write_json_line({"type": "success", "message": f"Thumbnail saved to {args.output}"})
 
         elif args.command == 'gif':
             converter.create_gif(
@@ -324,7 +1007,7 @@ if __name__ == '__main__':
                 fps=args.fps,
                 width=args.width
             )
-            print(json.dumps({"type": "success", "message": f"GIF saved to {args.output}"}))
+            _write_json_line({"type": "success", "message": f"GIF saved to {args.output}"})
 
     except (FFmpegError, FileNotFoundError) as e:
         print_json_error(e)
@@ -0,0 +1,60 @@
+"""Optional in-process NVDEC -> NVENC transcode path via PyNvVideoCodec.
+
+ffmpeg's CLI pipeline copies frames through its own filter graph even for a
+straight hardware transcode, which can leave NVDEC/NVENC undersaturated.
+PyNvVideoCodec keeps decoded surfaces in CUDA memory and hands them to the
+encoder directly, so the video stream never touches host RAM. Only the raw
+video bitstream is produced here; audio and container handling stay with
+ffmpeg (see FFmpegConverter._convert_pynvc).
+
+PyNvVideoCodec is an optional dependency: import this module and check
+is_available() before use.
+"""
+
+try:
+    import PyNvVideoCodec as _pnvc
+except ImportError:
+    _pnvc = None
+
+# Encoder codec names PyNvVideoCodec accepts.
+SUPPORTED_CODECS = frozenset(('h264', 'hevc', 'av1'))
+
+
+def is_available():
+    """True when PyNvVideoCodec is importable."""
+    return _pnvc is not None
+
+
+def transcode_video_stream(input_path, bitstream_path, codec='hevc',
+                           preset='P4', gpu_id=0):
+    """Decode input_path on NVDEC and re-encode on NVENC in-process.
+
+    Writes the resulting elementary video bitstream (Annex B) to
+    bitstream_path. Raises RuntimeError when PyNvVideoCodec is missing.
+    """
+    if _pnvc is None:
+        raise RuntimeError("PyNvVideoCodec is not installed")
+    if codec not in SUPPORTED_CODECS:
+        raise ValueError(f"Unsupported NVENC codec: {codec}")
+
+    demuxer = _pnvc.CreateDemuxer(filename=input_path)
+    decoder = _pnvc.CreateDecoder(
+        gpuid=gpu_id,
+        codec=demuxer.GetNvCodecId(),
+        cudacontext=0,
+        cudastream=0,
+        usedevicememory=True,
+    )
+    encoder = None
+    with open(bitstream_path, 'wb') as out:
+        for packet in demuxer:
+            for surface in decoder.Decode(packet):
+                if encoder is None:
+                    # Dimensions are only known after the first decoded frame.
+                    encoder = _pnvc.CreateEncoder(
+                        decoder.GetWidth(), decoder.GetHeight(), 'NV12', False,
+                        codec=codec, preset=preset, tuning_info='high_quality',
+                    )
+                out.write(bytearray(encoder.Encode(surface)))
+        if encoder is not None:
+            out.write(bytearray(encoder.EndEncode()))
@@ -1,15 +1,52 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, Listbox
+import json
 import os
 import sys
+import subprocess
 import threading
 import queue
 import platform
-import re
 
 # Add the parent directory to the path to find the core module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from core.ffmpeg_core import FFmpegConverter, FFmpegError
+from core.ffmpeg_core import FFmpegConverter, FFmpegError, BatchConverter
+
+# Last-used options, restored at startup so the combos are usable
+# immediately while the encoder scan runs in the background.
+_STATE_FILE = os.path.join(
+    os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config')),
+    'ffmpeg_converter', 'state.json')
+
+# Extensions (sans dot) accepted when scanning a folder; frozenset
+# membership is a single hash lookup per entry instead of a tuple walk.
+_VIDEO_EXTS = frozenset(('mp4', 'mov', 'avi', 'mkv', 'wmv'))
+
+# Combobox value lists, frozen at module scope so combo switches reuse
+# the same tuples instead of allocating fresh lists per event.
+_CPU_CODECS = ("H.265 (libx265)", "H.264 (libx264)")
+_CPU_MODES = ("CRF", "CBR")
+_HW_MODES = ("CQ", "CBR")
+_AUDIO_CODECS = ("Copy", "AAC (192k)")
+
+# (encoder, display label) candidates per hardware family; filtered
+# against the detected encoders once at startup.
+_HW_CODEC_CANDIDATES = {
+    "NVIDIA (nvenc)": (("hevc_nvenc", "H.265 (hevc_nvenc)"),
+                       ("h264_nvenc", "H.264 (h264_nvenc)")),
+    "Intel (qsv)": (("hevc_qsv", "H.265 (hevc_qsv)"),
+                    ("h264_qsv", "H.264 (h264_qsv)")),
+    "Apple (videotoolbox)": (("hevc_videotoolbox", "H.265 (hevc_videotoolbox)"),
+                             ("h264_videotoolbox", "H.264 (h264_videotoolbox)")),
+}
+
+# Maps every display label like "H.265 (libx265)" to its ffmpeg encoder
+# name, so picking the encoder is one dict lookup instead of a regex.
+_DISPLAY_TO_ENCODER = {label: label.rsplit('(', 1)[1].rstrip(')')
+                       for label in _CPU_CODECS}
+_DISPLAY_TO_ENCODER.update((label, enc)
+                           for cands in _HW_CODEC_CANDIDATES.values()
+                           for enc, label in cands)
 
 class App(tk.Tk):
     def __init__(self):
@@ -23,24 +60,38 @@ class App(tk.Tk):
         self.converter = FFmpegConverter()
         self.progress_queue = queue.Queue()
         self.files_to_convert = []
+        self._basenames = []     # Display column, parallel to files_to_convert.
+        self._files_set = set()  # Mirrors files_to_convert for O(1) dedup.
         self.is_converting = False
-        self.available_encoders = []
+        self.available_encoders = set()
+        self._hw_codec_lists = {}  # hw label -> available codec labels
+        self._last_prog_pct = -1
+        self._last_prog_msg = None
+        self._dialog_open = False  # Guards against stacked modal dialogs.
 
         # --- UI Variables ---
         self.output_dir = tk.StringVar(value=os.path.expanduser("~"))
         self.video_codec = tk.StringVar(value="H.265 (libx265)")
         self.hw_accel = tk.StringVar(value="None")
         self.quality_mode = tk.StringVar(value="CRF")
-        self.quality_value = tk.StringVar(value="23")
+        self.quality_value = tk.IntVar(value=23)
         self.audio_codec = tk.StringVar(value="Copy")
+        self.parallel_jobs = tk.IntVar(value=2)
+        self.combine_var = tk.BooleanVar()
         self.shutdown_var = tk.BooleanVar()
         self.status_label_var = tk.StringVar(value="Add files to the queue to begin.")
 
         # --- UI Construction ---
         self.create_widgets()
+        self._restore_state()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
         # --- Initial Population & Queue Processing ---
         self.after(100, self.populate_hw_accel)
+        # Queue draining is event-driven: producers fire <<QueueItem>> after
+        # each put, and a slow 500 ms poll acts as a safety net.
+        self.bind("<<QueueItem>>", self._on_queue_event)
+        self._poll_id = None
         self.process_progress_queue()
 
     def create_widgets(self):
@@ -52,14 +103,22 @@ class App(tk.Tk):
         queue_frame.pack(fill=tk.BOTH, expand=True, pady=5)
 
         self.file_listbox = Listbox(queue_frame, selectmode=tk.EXTENDED, height=8)
-        self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
+        self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        queue_scroll = ttk.Scrollbar(queue_frame, orient=tk.VERTICAL,
+                                     command=self.file_listbox.yview)
+        queue_scroll.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 10))
+        self.file_listbox.configure(yscrollcommand=queue_scroll.set)
 
         queue_btn_frame = ttk.Frame(queue_frame)
         queue_btn_frame.pack(side=tk.LEFT, fill=tk.Y)
-        ttk.Button(queue_btn_frame, text="Add File(s)", command=self.add_files).pack(fill=tk.X, pady=2)
-        ttk.Button(queue_btn_frame, text="Add Folder", command=self.add_folder).pack(fill=tk.X, pady=2)
-        ttk.Button(queue_btn_frame, text="Remove Selected", command=self.remove_selected).pack(fill=tk.X, pady=2)
-        ttk.Button(queue_btn_frame, text="Clear Queue", command=self.clear_queue).pack(fill=tk.X, pady=2)
+        self._queue_buttons = []
+        for label, command in (("Add File(s)", self.add_files),
+                               ("Add Folder", self.add_folder),
+                               ("Remove Selected", self.remove_selected),
+                               ("Clear Queue", self.clear_queue)):
+            btn = ttk.Button(queue_btn_frame, text=label, command=command)
+            btn.pack(fill=tk.X, pady=2)
+            self._queue_buttons.append(btn)
 
         # --- 2. Output Destination ---
         output_frame = ttk.LabelFrame(main_frame, text="2. Output Destination", padding="10")
@@ -76,7 +135,7 @@ class App(tk.Tk):
         options_frame.columnconfigure(3, weight=1)
 
         ttk.Label(options_frame, text="Video Codec:").grid(row=0, column=0, sticky="w")
-        self.codec_combo = ttk.Combobox(options_frame, textvariable=self.video_codec, state="readonly", values=["H.265 (libx265)", "H.264 (libx264)"])
+        self.codec_combo = ttk.Combobox(options_frame, textvariable=self.video_codec, state="readonly", values=_CPU_CODECS)
         self.codec_combo.grid(row=0, column=1, sticky="ew", padx=5)
 
         ttk.Label(options_frame, text="HW Accel:").grid(row=0, column=2, sticky="w", padx=10)
@@ -85,18 +144,22 @@ class App(tk.Tk):
         self.hw_accel_combo.bind("<<ComboboxSelected>>", self.on_hw_accel_change)
 
         ttk.Label(options_frame, text="Quality Mode:").grid(row=1, column=0, sticky="w")
-        self.mode_combo = ttk.Combobox(options_frame, textvariable=self.quality_mode, state="readonly", values=["CRF", "CBR"])
+        self.mode_combo = ttk.Combobox(options_frame, textvariable=self.quality_mode, state="readonly", values=_CPU_MODES)
         self.mode_combo.grid(row=1, column=1, sticky="ew", padx=5)
         self.mode_combo.bind("<<ComboboxSelected>>", self.on_quality_mode_change)
 
         self.quality_label = ttk.Label(options_frame, text="CRF Value (18-28):")
         self.quality_label.grid(row=1, column=2, sticky="w", padx=10)
-        self.quality_entry = ttk.Entry(options_frame, textvariable=self.quality_value, width=10)
+        self.quality_entry = ttk.Spinbox(options_frame, from_=0, to=51, width=10, textvariable=self.quality_value)
         self.quality_entry.grid(row=1, column=3, sticky="w")
 
         ttk.Label(options_frame, text="Audio Codec:").grid(row=2, column=0, sticky="w")
-        self.audio_combo = ttk.Combobox(options_frame, textvariable=self.audio_codec, state="readonly", values=["Copy", "AAC (192k)"])
+        self.audio_combo = ttk.Combobox(options_frame, textvariable=self.audio_codec, state="readonly", values=_AUDIO_CODECS)
         self.audio_combo.grid(row=2, column=1, sticky="ew", padx=5)
+
+        ttk.Label(options_frame, text="Parallel Jobs:").grid(row=2, column=2, sticky="w", padx=10)
+        self.parallel_spin = ttk.Spinbox(options_frame, from_=1, to=4, width=8, textvariable=self.parallel_jobs)
+        self.parallel_spin.grid(row=2, column=3, sticky="w")
         self.on_quality_mode_change() # Set initial state
 
         # --- 4. Actions & Progress ---
@@ -104,6 +167,8 @@ class App(tk.Tk):
         bottom_frame.pack(fill=tk.X, pady=5)
         self.shutdown_check = ttk.Checkbutton(bottom_frame, text="Shutdown when complete", variable=self.shutdown_var)
         self.shutdown_check.pack(side=tk.LEFT, pady=10)
+        self.combine_check = ttk.Checkbutton(bottom_frame, text="Combine into one file", variable=self.combine_var)
+        self.combine_check.pack(side=tk.LEFT, padx=10, pady=10)
         self.start_btn = ttk.Button(bottom_frame, text="Start Conversion", command=self.start_conversion)
         self.start_btn.pack(side=tk.RIGHT, ipady=10, padx=5)
 
@@ -111,58 +176,130 @@ class App(tk.Tk):
         self.progress_bar.pack(fill=tk.X, pady=5)
         ttk.Label(main_frame, textvariable=self.status_label_var, wraplength=720).pack(fill=tk.X, pady=5)
 
+        # Cached once so toggle_ui_state iterates a flat list instead of
+        # walking the widget tree through Tcl on every enable/disable.
+        self._stateful_widgets = self._queue_buttons + [
+            self.file_listbox, self.browse_btn,
+            self.codec_combo, self.hw_accel_combo, self.mode_combo,
+            self.quality_entry, self.audio_combo, self.parallel_spin,
+            self.combine_check, self.shutdown_check, self.start_btn,
+        ]
+
     # --- UI Event Handlers ---
     def add_files(self):
-        filepaths = filedialog.askopenfilenames(filetypes=(("Video Files", "*.mp4 *.mov *.avi *.mkv"), ("All files", "*.*")))
-        for fp in filepaths:
-            if fp not in self.files_to_convert:
-                self.files_to_convert.append(fp)
-                self.file_listbox.insert(tk.END, os.path.basename(fp))
-        self.update_status_from_queue()
+        # Double-clicks on the button would stack a second modal dialog on
+        # top of the first; the guard makes re-entry a no-op.
+        if self._dialog_open: return
+        self._dialog_open = True
+        try:
+            filepaths = filedialog.askopenfilenames(filetypes=(("Video Files", "*.mp4 *.mov *.avi *.mkv"), ("All files", "*.*")))
+        finally:
+            self._dialog_open = False
+        self._add_scanned_files(filepaths)
 
     def add_folder(self):
-        folder = filedialog.askdirectory()
+        if self._dialog_open: return
+        self._dialog_open = True
+        try:
+            folder = filedialog.askdirectory()
+        finally:
+            self._dialog_open = False
         if folder:
-            for f in os.listdir(folder):
-                if f.lower().endswith(('.mp4', '.mov', '.avi', '.mkv')):
-                    fp = os.path.join(folder, f)
-                    if fp not in self.files_to_convert:
-                        self.files_to_convert.append(fp)
-                        self.file_listbox.insert(tk.END, f)
+            # The scan runs off the Tk thread (network mounts and huge
+            # directories can stall for seconds); results come back through
+            # the progress queue as a FILES_ADDED message.
+            self.status_label_var.set(f"Scanning {folder}...")
+            threading.Thread(target=self._scan_folder_worker, args=(folder,), daemon=True).start()
+
+    def _scan_folder_worker(self, folder):
+        # os.scandir caches the file type from the directory read, so
+        # large folders are filtered without a stat() per entry.
+        paths = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    # rpartition avoids splitext's tuple and dirname walk;
+                    # only the (short) suffix gets lowercased.
+                    ext = entry.name.rpartition('.')[2]
+                    if ext and ext.lower() in _VIDEO_EXTS:
+                        paths.append(entry.path)
+        except OSError as e:
+            self._queue_put(("ERROR", f"Could not read folder: {e}"))
+            return
+        self._queue_put(("FILES_ADDED", paths))
+
+    def _add_scanned_files(self, paths):
+        """Applies a FILES_ADDED batch on the Tk main thread."""
+        added = [fp for fp in paths if fp not in self._files_set]
+        if added:
+            names = [os.path.basename(fp) for fp in added]
+            self.files_to_convert.extend(added)
+            self._basenames.extend(names)
+            self._files_set.update(added)
+            # One variadic insert is a single Python<->Tcl round-trip
+            # instead of one per file.
+            self.file_listbox.insert(tk.END, *names)
+        self._warm_probe_cache(added)
         self.update_status_from_queue()
 
+    def _warm_probe_cache(self, paths):
+        """Probes newly queued files in the background.
+
+        Goes through probe() - the call convert() makes - so by the time
+        the user clicks Start the full probe results are already cached
+        and convert() never blocks on ffprobe. (get_video_duration would
+        be satisfied by the MP4 header sniff without filling that cache.)
+        """
+        if not paths:
+            return
+        def worker():
+            for fp in paths:
+                try:
+                    self.converter.probe(fp)
+                except Exception:
+                    pass  # Real problems surface when the conversion runs.
+        threading.Thread(target=worker, daemon=True).start()
+
     def remove_selected(self):
         for i in sorted(self.file_listbox.curselection(), reverse=True):
+            self._files_set.discard(self.files_to_convert[i])
             del self.files_to_convert[i]
+            del self._basenames[i]
             self.file_listbox.delete(i)
         self.update_status_from_queue()
 
     def clear_queue(self):
         self.files_to_convert.clear()
+        self._basenames.clear()
+        self._files_set.clear()
         self.file_listbox.delete(0, tk.END)
         self.update_status_from_queue()
 
     def select_output_dir(self):
-        folder = filedialog.askdirectory()
+        if self._dialog_open: return
+        self._dialog_open = True
+        try:
+            folder = filedialog.askdirectory()
+        finally:
+            self._dialog_open = False
         if folder: self.output_dir.set(folder)
 
     def on_quality_mode_change(self, event=None):
         mode = self.quality_mode.get()
-        if mode == "CRF": self.quality_label.config(text="CRF Value (18-28):"); self.quality_value.set("23")
-        elif mode == "CBR": self.quality_label.config(text="Bitrate (Mbps):"); self.quality_value.set("10")
-        elif mode == "CQ": self.quality_label.config(text="CQ Value (0-51):"); self.quality_value.set("24")
+        if mode == "CRF": self.quality_label.config(text="CRF Value (18-28):"); self.quality_value.set(23); self.quality_entry.configure(from_=0, to=51)
+        elif mode == "CBR": self.quality_label.config(text="Bitrate (Mbps):"); self.quality_value.set(10); self.quality_entry.configure(from_=1, to=200)
+        elif mode == "CQ": self.quality_label.config(text="CQ Value (0-51):"); self.quality_value.set(24); self.quality_entry.configure(from_=0, to=51)
 
     def on_hw_accel_change(self, event=None):
         hw = self.hw_accel.get()
-        codecs, modes = (["H.265 (libx265)", "H.264 (libx264)"], ["CRF", "CBR"])
+        codecs, modes = _CPU_CODECS, _CPU_MODES
         if "None" not in hw:
-            modes = ["CQ", "CBR"]
-            available = self.available_encoders
-            if "NVIDIA" in hw: codecs = [c for c in ["H.265 (hevc_nvenc)", "H.264 (h264_nvenc)"] if re.search(r'\((\S+)\)', c).group(1) in available]
-            elif "Intel" in hw: codecs = [c for c in ["H.265 (hevc_qsv)", "H.264 (h264_qsv)"] if re.search(r'\((\S+)\)', c).group(1) in available]
-            elif "Apple" in hw: codecs = [c for c in ["H.265 (hevc_videotoolbox)", "H.264 (h264_videotoolbox)"] if re.search(r'\((\S+)\)', c).group(1) in available]
+            modes = _HW_MODES
+            codecs = self._hw_codec_lists.get(hw, ())
 
-        self.codec_combo['values'] = codecs if codecs else ["H.265 (libx265)"]
+        self.codec_combo['values'] = codecs if codecs else _CPU_CODECS[:1]
         self.video_codec.set(self.codec_combo['values'][0])
         self.mode_combo['values'] = modes
         self.quality_mode.set(modes[0])
@@ -170,13 +307,8 @@ class App(tk.Tk):
 
     def toggle_ui_state(self, is_enabled):
         state = tk.NORMAL if is_enabled else tk.DISABLED
-        for child in self.winfo_children():
-            for widget in child.winfo_children():
-                try:
-                    # This is a bit brute-force, but effective for simple UIs
-                    if isinstance(widget, (ttk.Button, ttk.Entry, ttk.Combobox, Listbox, ttk.Checkbutton)):
-                         widget.configure(state=state)
-                except tk.TclError: pass
+        for widget in self._stateful_widgets:
+            widget.configure(state=state)
         if is_enabled: self.on_quality_mode_change() # Re-apply disabled state on quality inputs
 
     # --- Core Logic & Threading ---
@@ -186,88 +318,317 @@ class App(tk.Tk):
 
     def _populate_hw_accel_worker(self):
         try:
-            self.available_encoders = self.converter.get_available_encoders()
+            # Stored as a set: every probe against it is a hash lookup.
+            self.available_encoders = set(self.converter.get_available_encoders())
+            # One joined blob and one substring test per hardware family,
+            # instead of three any() scans over the encoder list.
+            enc_blob = '\n'.join(self.available_encoders)
             hw_options = ["None"]
-            if any("nvenc" in e for e in self.available_encoders): hw_options.append("NVIDIA (nvenc)")
-            if any("qsv" in e for e in self.available_encoders): hw_options.append("Intel (qsv)")
-            if any("videotoolbox" in e for e in self.available_encoders): hw_options.append("Apple (videotoolbox)")
-            self.progress_queue.put(("HW_ACCEL", hw_options))
+            for tag, label in (('nvenc', "NVIDIA (nvenc)"),
+                               ('qsv', "Intel (qsv)"),
+                               ('videotoolbox', "Apple (videotoolbox)")):
+                if tag in enc_blob: hw_options.append(label)
+            # Filter the codec labels per hardware type once, here, so the
+            # combobox handler only does a dict lookup on every selection.
+            codec_lists = {
+                hw: [label for enc, label in cands if enc in self.available_encoders]
+                for hw, cands in _HW_CODEC_CANDIDATES.items()
+            }
+            self._queue_put(("HW_ACCEL", hw_options, codec_lists))
         except (FFmpegError, FileNotFoundError) as e:
-            self.progress_queue.put(("ERROR", f"ffmpeg not found. Please ensure it's in your system's PATH. Error: {e}"))
+            self._queue_put(("ERROR", f"ffmpeg not found. Please ensure it's in your system's PATH. Error: {e}"))
 
     def start_conversion(self):
+        # A second click before toggle_ui_state disables the button would
+        # launch a competing worker thread; make re-entry a no-op.
+        if self.is_converting: return
         if not self.files_to_convert: messagebox.showerror("Error", "The file queue is empty."); return
-        try: int(self.quality_value.get())
-        except ValueError: messagebox.showerror("Error", "Quality/bitrate must be a number."); return
+        # IntVar.get() raises TclError when a spinbox holds non-numeric
+        # text; both must be read before the UI is disabled below, or a
+        # bad value would leave it stuck disabled.
+        try: quality = self.quality_value.get()
+        except tk.TclError: messagebox.showerror("Error", "Quality/bitrate must be a number."); return
+        try: parallel = self.parallel_jobs.get()
+        except tk.TclError: parallel = 2
 
         self.is_converting = True
         self.toggle_ui_state(False)
         self.progress_bar['value'] = 0
+        self._last_prog_pct = -1
+        self._last_prog_msg = None
+        self._dialog_open = False  # Guards against stacked modal dialogs.
 
-        # Extract the ffmpeg codec name like 'libx265' from "H.265 (libx265)"
-        codec_match = re.search(r'\((\S+)\)', self.video_codec.get())
+        # Each StringVar.get() is a Python<->Tcl round-trip; read each
+        # variable once into a local.
+        hw = self.hw_accel.get()
 
         options = {
-            'video_codec': codec_match.group(1) if codec_match else "libx265",
+            'video_codec': _DISPLAY_TO_ENCODER.get(self.video_codec.get(), "libx265"),
             'quality_mode': self.quality_mode.get().lower(),
-            'quality_value': int(self.quality_value.get()),
+            'quality_value': quality,
             'audio_codec': 'aac' if 'AAC' in self.audio_codec.get() else 'copy',
-            'hw_accel': self.hw_accel.get().split(" ")[-1].strip("()") if 'None' not in self.hw_accel.get() else None,
+            'hw_accel': hw.split(" ")[-1].strip("()") if 'None' not in hw else None,
             'output_dir': self.output_dir.get(),
+            'parallel_jobs': max(1, min(4, parallel)),
+            'combine': self.combine_var.get(),
             'shutdown': self.shutdown_var.get()
         }
-        threading.Thread(target=self.run_conversion_worker, args=(self.files_to_convert.copy(), options), daemon=True).start()
+        threading.Thread(target=self.run_conversion_worker, args=(tuple(self.files_to_convert), options), daemon=True).start()
 
     def run_conversion_worker(self, files, options):
-        for i, filepath in enumerate(files):
+        encode_keys = ('video_codec', 'quality_mode', 'quality_value', 'audio_codec', 'hw_accel')
+        encode_options = {k: options[k] for k in encode_keys}
+        # Hoisted out of the per-file paths: the dict lookup, the bound
+        # method and the file count don't change mid-run.
+        out_dir = options['output_dir']
+        total = len(files)
+        put = self._queue_put
+
+        # All output paths are planned up front in one comprehension (bound
+        # locals keep the per-file work to a basename+rsplit+join), which
+        # also makes the resumable-batch filtering below a single pass.
+        basename, join = os.path.basename, os.path.join
+        plans = [(fp, join(out_dir, basename(fp).rsplit('.', 1)[0] + "_converted.mp4"))
+                 for fp in files]
+
+        # Resumable batches: skip inputs recorded in the completion log or
+        # whose output already exists, so a restarted 500-file run only
+        # encodes what is actually missing.
+        done = self._load_done_log(out_dir)
+        pending = [(fp, out) for fp, out in plans
+                   if fp not in done and not os.path.exists(out)]
+        if len(pending) != total:
+            put(("STATUS", f"Skipping {total - len(pending)} already-converted file(s)."))
+            plans = pending
+            total = len(plans)
+
+        parallel = options.get('parallel_jobs', 1)
+        if options.get('combine') and total > 1:
+            # Concat demuxer: one ffmpeg process encodes the whole set into
+            # a single output, amortizing process/encoder startup that
+            # dominates on many small clips.
+            base = basename(plans[0][0]).rsplit('.', 1)[0]
+            output_path = join(out_dir, base + "_combined.mp4")
             try:
-                base, _ = os.path.splitext(os.path.basename(filepath))
-                output_path = os.path.join(options['output_dir'], f"{base}_converted.mp4")
-                self.progress_queue.put(("STATUS", f"({i+1}/{len(files)}) Converting {base}..."))
-                self.converter.convert(filepath, output_path, **options, progress_callback=self.progress_callback)
+                put(("STATUS", f"Combining {total} files into {os.path.basename(output_path)}..."))
+                concat_options = {k: v for k, v in encode_options.items() if k != 'hw_accel'}
+                self.converter.convert_concat([fp for fp, _ in plans], output_path,
+                                              progress_callback=self.progress_callback,
+                                              **concat_options)
             except (FFmpegError, FileNotFoundError) as e:
-                self.progress_queue.put(("ERROR", f"Failed on {os.path.basename(filepath)}: {e}")); return
+                put(("ERROR", f"Combine failed: {e}")); return
             except Exception as e:
-                self.progress_queue.put(("ERROR", f"An unexpected error occurred: {e}")); return
+                put(("ERROR", f"An unexpected error occurred: {e}")); return
+        elif encode_options['hw_accel'] and total > 1 and parallel > 1:
+            # A single ffmpeg rarely saturates the encoder ASIC; 2-3
+            # concurrent sessions finish a queue noticeably faster.
+            # BatchConverter's GPU semaphore enforces the session cap.
+            jobs = [{'input_path': fp, 'output_path': out, **encode_options}
+                    for fp, out in plans]
+            put(("STATUS", f"Converting {total} files on {parallel} parallel encoder sessions..."))
+            if not self._run_job_pool(jobs, total, put,
+                                      BatchConverter(self.converter, max_concurrent=parallel,
+                                                     gpu_sessions=parallel)):
+                return
+        elif encode_options['hw_accel'] and total > 1:
+            # One ffmpeg process for the whole batch: the hardware encoder
+            # session (the dominant fixed cost on short clips) is created
+            # once instead of per file.
+            jobs = [{'input_path': fp, 'output_path': out, **encode_options}
+                    for fp, out in plans]
+            try:
+                put(("STATUS", f"Converting {total} files in a single batch..."))
+                self.converter.convert_many(jobs, progress_callback=self.progress_callback)
+                for job in jobs:
+                    self._log_done(out_dir, job['input_path'])
+            except (FFmpegError, FileNotFoundError) as e:
+                put(("ERROR", f"Batch conversion failed: {e}")); return
+            except Exception as e:
+                put(("ERROR", f"An unexpected error occurred: {e}")); return
+        elif total > 1:
+            # Software encodes run through the bounded thread pool: each job
+            # gets a per-encode -threads budget from BatchConverter so K
+            # concurrent x265 encodes split the cores instead of fighting
+            # over all of them.
+            jobs = [{'input_path': fp, 'output_path': out, **encode_options}
+                    for fp, out in plans]
+            batch = BatchConverter(self.converter)
+            put(("STATUS",
+                f"Converting {total} files on {batch.max_concurrent} parallel workers..."))
+            if not self._run_job_pool(jobs, total, put, batch):
+                return
+        else:
+            for i, (filepath, output_path) in enumerate(plans):
+                try:
+                    name = basename(filepath)
+                    put(("STATUS", f"({i+1}/{total}) Converting {name.rsplit('.', 1)[0]}..."))
+                    self.converter.convert(filepath, output_path, **encode_options,
+                                           progress_callback=self.progress_callback)
+                    self._log_done(out_dir, filepath)
+                except (FFmpegError, FileNotFoundError) as e:
+                    put(("ERROR", f"Failed on {name}: {e}")); return
+                except Exception as e:
+                    put(("ERROR", f"An unexpected error occurred: {e}")); return
 
         if options['shutdown']:
-            self.progress_queue.put(("SHUTDOWN", "All tasks complete! Shutting down in 60 seconds..."))
+            put(("SHUTDOWN", "All tasks complete! Shutting down in 60 seconds..."))
         else:
-            self.progress_queue.put(("DONE", "All conversions finished!"))
+            put(("DONE", "All conversions finished!"))
+
+    def _run_job_pool(self, jobs, total, put, batch):
+        """Runs jobs through a BatchConverter, reporting completed counts.
+
+        Returns False (after posting an ERROR) when any job fails.
+        """
+        try:
+            done = 0
+            for job, future in batch.map(jobs):
+                try:
+                    future.result()
+                except (FFmpegError, FileNotFoundError) as e:
+                    put(("ERROR", f"Failed on {os.path.basename(job['input_path'])}: {e}")); return False
+                except Exception as e:
+                    put(("ERROR", f"An unexpected error occurred: {e}")); return False
+                done += 1
+                self._log_done(os.path.dirname(job['output_path']), job['input_path'])
+                put(("PROGRESS", int(done * 100 / total), f"Finished {done}/{total} files."))
+        finally:
+            batch.shutdown()
+        return True
+
+    @staticmethod
+    def _load_done_log(out_dir):
+        """Reads the set of source paths already converted into out_dir."""
+        try:
+            with open(os.path.join(out_dir, '.converted.log'), encoding='utf-8') as f:
+                return {line.rstrip('\n') for line in f}
+        except OSError:
+            return set()
+
+    @staticmethod
+    def _log_done(out_dir, filepath):
+        """Appends a completed source path to the per-folder completion log."""
+        try:
+            with open(os.path.join(out_dir, '.converted.log'), 'a', encoding='utf-8') as f:
+                f.write(filepath + '\n')
+        except OSError:
+            pass  # The log is an optimization; never fail a conversion over it.
+
+    def _queue_put(self, item):
+        """Enqueues a message and wakes the Tk main loop immediately.
+
+        event_generate(when='tail') is thread-safe on Tk 8.6, so the drain
+        runs on the next main-loop turn instead of up to a poll tick later.
+        """
+        self.progress_queue.put(item)
+        try:
+            self.event_generate("<<QueueItem>>", when="tail")
+        except tk.TclError:
+            pass  # Window is being torn down.
+
+    def _on_queue_event(self, event=None):
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.process_progress_queue()
 
     def progress_callback(self, percentage, message):
-        self.progress_queue.put(("PROGRESS", percentage, message))
+        # Integer-percent dedup at the source: the parser can fire far more
+        # often than the bar can visibly move, and every enqueued tick costs
+        # a cross-thread handoff plus a Tcl configure on drain.
+        p = int(percentage)
+        if p == self._last_prog_pct and message == self._last_prog_msg:
+            return
+        self._last_prog_pct = p
+        self._last_prog_msg = message
+        self._queue_put(("PROGRESS", p, message))
 
     def process_progress_queue(self):
-        try:
-            item = self.progress_queue.get_nowait()
+        # Drain everything queued since the last wakeup. The progress bar is
+        # only written once per drain (each assignment triggers a Tk
+        # redraw), using the last percentage seen.
+        latest_progress = None
+        while True:
+            try:
+                item = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
             msg_type, *payload = item
 
             if msg_type == "PROGRESS":
-                percentage, message = payload
-                self.progress_bar['value'] = percentage
-                self.status_label_var.set(message)
+                latest_progress = payload
             elif msg_type == "STATUS":
                 self.status_label_var.set(payload[0])
             elif msg_type == "DONE":
-                self.is_converting, self.toggle_ui_state = False, self.toggle_ui_state(True)
+                # No modal on success: the status label says it all, and a
+                # dialog would block queueing the next batch.
+                self.is_converting = False
+                self.toggle_ui_state(True)
                 self.status_label_var.set(payload[0])
-                messagebox.showinfo("Success", "All videos converted successfully.")
             elif msg_type == "ERROR":
-                self.is_converting, self.toggle_ui_state = False, self.toggle_ui_state(True)
+                self.is_converting = False
+                self.toggle_ui_state(True)
                 self.status_label_var.set(f"An error occurred: {payload[0]}")
-                messagebox.showerror("Error", payload[0])
+                # Only the unrecoverable missing-ffmpeg case warrants a
+                # modal; per-batch failures are spelled out in the label.
+                if "ffmpeg not found" in payload[0]:
+                    messagebox.showerror("Error", payload[0])
+            elif msg_type == "FILES_ADDED":
+                self._add_scanned_files(payload[0])
             elif msg_type == "HW_ACCEL":
                 self.hw_accel_combo['values'] = payload[0]
+                self._hw_codec_lists = payload[1]
                 self.status_label_var.set("Ready. Add files to the queue to begin.")
             elif msg_type == "SHUTDOWN":
                 self.status_label_var.set(payload[0])
                 self.initiate_shutdown()
 
-        except queue.Empty:
-            pass
-        finally:
-            self.after(100, self.process_progress_queue)
+        if latest_progress is not None:
+            self.progress_bar['value'] = latest_progress[0]
+            self.status_label_var.set(latest_progress[1])
+        self._poll_id = self.after(500, self.process_progress_queue)
+
+    # --- Option Persistence ---
+    def _persisted_vars(self):
+        return (('video_codec', self.video_codec), ('hw_accel', self.hw_accel),
+                ('quality_mode', self.quality_mode), ('quality_value', self.quality_value),
+                ('audio_codec', self.audio_codec), ('output_dir', self.output_dir),
+                ('parallel_jobs', self.parallel_jobs))
+
+    def _restore_state(self):
+        """Applies the options saved by the previous session, if any."""
+        try:
+            with open(_STATE_FILE, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        quality = state.get('quality_value')
+        for key, var in self._persisted_vars():
+            if key in state:
+                try: var.set(state[key])
+                except tk.TclError: pass
+        # Re-apply the mode-dependent label and spinbox range, then put the
+        # saved value back (the mode change resets it to the mode default).
+        self.on_quality_mode_change()
+        if quality is not None:
+            try: self.quality_value.set(quality)
+            except tk.TclError: pass
+
+    def _save_state(self):
+        state = {}
+        for key, var in self._persisted_vars():
+            try: state[key] = var.get()
+            except tk.TclError: pass
+        try:
+            os.makedirs(os.path.dirname(_STATE_FILE), exist_ok=True)
+            with open(_STATE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        except OSError:
+            pass  # Persistence is a convenience; never block closing over it.
+
+    def _on_close(self):
+        self._save_state()
+        self.destroy()
 
     def update_status_from_queue(self):
         if not self.is_converting:
@@ -276,11 +637,17 @@ class App(tk.Tk):
     def initiate_shutdown(self):
         system = platform.system()
         try:
-            if system == "Windows": os.system("shutdown /s /t 60")
-            elif system == "Darwin" or system == "Linux": os.system("sudo shutdown -h +1")
-            else: self.progress_queue.put(("ERROR", "Shutdown is not supported on this OS."))
+            # Popen without a shell: no intermediate cmd.exe//bin/sh fork,
+            # and the UI thread is never blocked waiting on one.
+            if system == "Windows":
+                subprocess.Popen(["shutdown", "/s", "/t", "60"],
+                                 creationflags=0x08000000)  # CREATE_NO_WINDOW
+            elif system in ("Darwin", "Linux"):
+                subprocess.Popen(["sudo", "-n", "shutdown", "-h", "+1"])
+            else:
+                self._queue_put(("ERROR", "Shutdown is not supported on this OS."))
         except Exception as e:
-            self.progress_queue.put(("ERROR", f"Failed to initiate shutdown: {e}"))
+            self._queue_put(("ERROR", f"Failed to initiate shutdown: {e}"))
 
 if __name__ == "__main__":
     app = App()
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Make the repo root importable once, for every test module.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture(scope="session")
+def converter():
+    """One FFmpegConverter for the whole run.
+
+    Session-scoped so caches warmed by one module (encoder list, probe
+    results) carry over instead of being rebuilt per module. Tests that
+    need pristine cache state construct their own instance.
+    """
+    from core.ffmpeg_core import FFmpegConverter
+    return FFmpegConverter()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_encoder_cache(tmp_path, monkeypatch):
+    """Points the on-disk encoder cache at a per-test temp file.
+
+    get_available_encoders persists its result keyed to the real ffmpeg
+    binary even under force_rescan; without this, a mocked unit test
+    would write its fake encoder list into the user's actual cache and
+    poison the next real launch.
+    """
+    from core import ffmpeg_core
+    monkeypatch.setattr(ffmpeg_core, '_ENCODER_CACHE_FILE',
+                        str(tmp_path / 'encoders.json'))
+
+
+@pytest.fixture(autouse=True)
+def _no_stray_subprocess(request, monkeypatch):
+    """Keeps unit tests from ever reaching a real fork/exec.
+
+    The unit tests all patch _run_command / Popen at the converter level;
+    this guard turns any hole in that mocking into a loud failure instead
+    of a silent (and slow) real ffmpeg spawn. The integration class is
+    exempt - it exists to run the real binaries.
+    """
+    if request.cls is not None and 'Integration' in request.cls.__name__:
+        return
+
+    def _blocked(*args, **kwargs):
+        raise AssertionError(f"unit test attempted a real subprocess call: {args!r}")
+
+    monkeypatch.setattr(subprocess, 'run', _blocked)
+    monkeypatch.setattr(subprocess, 'Popen', _blocked)